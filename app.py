@@ -1,13 +1,34 @@
 import streamlit as st
-import requests
+import httpx
+import asyncio
+import threading
+import contextlib
+import hashlib
 import json
+import msgspec
+import io
+import zipfile
+from xml.etree import ElementTree
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import google.generativeai as genai
+from google.generativeai import caching
+from google.generativeai import client as genai_client
 import tempfile
 import os
-from typing import Dict, List
+from typing import List, Optional
 import pandas as pd
-import re
+import numpy as np
+import string
+from pathlib import Path
+
+try:
+    from pydub import AudioSegment
+    from pydub.utils import mediainfo_json
+except ImportError:  # optional: without pydub (and ffmpeg) recordings upload as-is
+    AudioSegment = None
 
 # Configure page
 st.set_page_config(
@@ -16,217 +37,383 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .step-header {
-        font-size: 1.5rem;
-        font-weight: bold;
-        color: #ff7f0e;
-        margin: 1rem 0;
-        padding: 0.5rem;
-        background: linear-gradient(90deg, #ff7f0e20, transparent);
-        border-left: 4px solid #ff7f0e;
-        border-radius: 5px;
-    }
-    .phase-header {
-        font-size: 1.8rem;
-        font-weight: bold;
-        color: #2ca02c;
-        margin: 1.5rem 0;
-        padding: 1rem;
-        background: linear-gradient(90deg, #2ca02c20, transparent);
-        border-left: 6px solid #2ca02c;
-        border-radius: 8px;
-    }
-    .info-box {
-        background-color: #f0f8ff;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #1f77b4;
-        margin: 1rem 0;
-    }
-    .success-box {
-        background-color: #f0fff0;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #2ca02c;
-        margin: 1rem 0;
-    }
-    .warning-box {
-        background-color: #fff8dc;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #ffa500;
-        margin: 1rem 0;
-    }
-    .error-box {
-        background-color: #fff0f0;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #d62728;
-        margin: 1rem 0;
-    }
-    .workflow-step {
-        background-color: #f8f9fa;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border: 2px solid #dee2e6;
-        margin: 1rem 0;
-    }
-    .completed-step {
-        background-color: #d4edda;
-        border-color: #2ca02c;
-    }
-    .current-step {
-        background-color: #fff3cd;
-        border-color: #ffa500;
-    }
-    .chat-message {
-        padding: 1rem;
-        margin: 0.5rem 0;
-        border-radius: 8px;
-    }
-    .user-message {
-        background-color: #e3f2fd;
-        border-left: 4px solid #2196f3;
-    }
-    .assistant-message {
-        background-color: #f3e5f5;
-        border-left: 4px solid #9c27b0;
-    }
-    .refinement-section {
-        background-color: #fff9c4;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border: 2px solid #fbc02d;
-        margin: 1rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+ASSETS_DIR = Path(__file__).parent / "assets"
+
+# Newline for joins inside f-string expressions, which can't contain backslashes
+NL = "\n"
+
+AGENT_FIELDS = ("name", "company", "language", "category")
+AGENT_LANGUAGES = ("Hinglish", "English", "Hindi", "Tamil", "Telugu", "Gujarati", "Marathi")
+AGENT_LANGUAGE_INDEX = {language: i for i, language in enumerate(AGENT_LANGUAGES)}
+PROMPT_CATEGORIES = ("Lead Qualification", "EMI Reminder", "Property Sales", "Loan Collection", "Insurance Sales", "Customer Support", "Appointment Booking", "Survey & Feedback")
+PROMPT_CATEGORY_INDEX = {category: i for i, category in enumerate(PROMPT_CATEGORIES)}
 
 # Initialize session state
 if 'primary_prompt' not in st.session_state:
     st.session_state.primary_prompt = None
 if 'master_prompt' not in st.session_state:
     st.session_state.master_prompt = None
+if 'primary_prompt_id' not in st.session_state:
+    st.session_state.primary_prompt_id = None
+if 'master_prompt_id' not in st.session_state:
+    st.session_state.master_prompt_id = None
+if 'primary_prompt_key' not in st.session_state:
+    st.session_state.primary_prompt_key = None
+if 'primary_prompt_ts' not in st.session_state:
+    st.session_state.primary_prompt_ts = None
+if 'master_prompt_ts' not in st.session_state:
+    st.session_state.master_prompt_ts = None
 if 'call_insights' not in st.session_state:
     st.session_state.call_insights = []
-if 'transcriptions' not in st.session_state:
-    st.session_state.transcriptions = []
-if 'api_configured' not in st.session_state:
-    st.session_state.api_configured = False
 if 'current_phase' not in st.session_state:
     st.session_state.current_phase = 1
 if 'agent_details' not in st.session_state:
     st.session_state.agent_details = {}
 if 'refinement_history' not in st.session_state:
     st.session_state.refinement_history = []
-if 'refinement_chat' not in st.session_state:
-    st.session_state.refinement_chat = []
+if 'evolution_analysis' not in st.session_state:
+    st.session_state.evolution_analysis = None
+if 'combined_insights' not in st.session_state:
+    st.session_state.combined_insights = ""
+if 'combined_insights_count' not in st.session_state:
+    st.session_state.combined_insights_count = 0
+
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+@st.cache_resource(show_spinner=False)
+def _gemini_config():
+    """Lock and currently configured API key for the Gemini SDK's process-wide default clients"""
+    return {"lock": threading.Lock(), "api_key": None}
+
+@contextlib.contextmanager
+def using_gemini_key(api_key):
+    """Hold the Gemini SDK's default clients on api_key for the duration of the block"""
+    config = _gemini_config()
+    with config["lock"]:
+        if config["api_key"] != api_key:
+            genai.configure(api_key=api_key)
+            config["api_key"] = api_key
+        yield
+
+async def _default_async_client():
+    """Async generative client for the currently configured key"""
+    return genai_client.get_default_generative_async_client()
+
+def bind_gemini_key(model, api_key):
+    """Give a model its own clients for api_key so it never runs on another session's key"""
+    with using_gemini_key(api_key):
+        model._client = genai_client.get_default_generative_client()
+        # grpc.aio clients belong to the loop they're created on, so build it on the shared one
+        model._async_client = asyncio.run_coroutine_threadsafe(_default_async_client(), _event_loop()).result()
+    return model
+
+@st.cache_resource(show_spinner=False)
+def get_gemini_model(api_key, model_name=GEMINI_MODEL):
+    """Build a Gemini model bound to the given API key (runs once per key and model)"""
+    return bind_gemini_key(genai.GenerativeModel(model_name), api_key)
 
 def configure_gemini(api_key):
     """Configure Gemini AI with the provided API key"""
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        st.session_state.api_configured = True
-        return model
+        return get_gemini_model(api_key)
     except Exception as e:
         st.error(f"Failed to configure Gemini AI: {str(e)}")
-        st.session_state.api_configured = False
         return None
 
-def seconds_to_hms(seconds):
-    """Convert seconds (float) to [HH:MM:SS] format."""
-    td = str(timedelta(seconds=int(seconds)))
-    if len(td.split(':')) == 2:
-        td = "00:" + td
-    return f"[{td}]"
+COMPLETION_CACHE_SIZE = 64
+COMPLETION_CACHE_TTL = timedelta(hours=1)
 
-def transcribe_audio(audio_file, deepgram_api_key: str, language: str = "hi") -> Dict:
+@st.cache_resource(show_spinner=False)
+def _completion_cache():
+    """Finished Gemini completions keyed on model name and input hashes, and the lock guarding them"""
+    return OrderedDict(), threading.Lock()
+
+def cached_completion(key) -> Optional[str]:
+    """Memoized completion for key, marked most recently used, or None once COMPLETION_CACHE_TTL old"""
+    cache, lock = _completion_cache()
+    with lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        text, stored_at = entry
+        if datetime.now() - stored_at > COMPLETION_CACHE_TTL:
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return text
+
+def remember_completion(key, text: str):
+    """Memoize a finished completion, dropping the least recently used past COMPLETION_CACHE_SIZE"""
+    cache, lock = _completion_cache()
+    with lock:
+        cache[key] = (text, datetime.now())
+        cache.move_to_end(key)
+        while len(cache) > COMPLETION_CACHE_SIZE:
+            cache.popitem(last=False)
+
+def forget_completion(key):
+    """Drop key's memoized completion so the next request asks Gemini again"""
+    cache, lock = _completion_cache()
+    with lock:
+        cache.pop(key, None)
+
+def completion_key(prompt_text: str, model):
+    """Completion cache key for a prompt sent to model"""
+    return (model.model_name, hashlib.sha256(prompt_text.encode()).hexdigest())
+
+def stream_generate(prompt_text: str, model) -> str:
+    """Stream a Gemini completion into the page and return the full text, memoized on prompt and model"""
+    key = completion_key(prompt_text, model)
+    text = cached_completion(key)
+    if text is not None:
+        return text
+    
+    buf = []
+    placeholder = st.empty()
+    for chunk in model.generate_content(prompt_text, stream=True):
+        buf.append(chunk.text)
+        placeholder.markdown(''.join(buf))
+    text = ''.join(buf)
+    
+    remember_completion(key, text)
+    return text
+
+@st.cache_resource(show_spinner=False)
+def _event_loop():
+    """Long-lived event loop for the async API clients, shared across reruns"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+def run_async_each(coros, on_done=None) -> List:
+    """Run coroutines on the shared event loop, calling on_done(n) as the n-th finishes; returns results or exceptions in input order"""
+    futures = [asyncio.run_coroutine_threadsafe(c, _event_loop()) for c in coros]
+    for n, _ in enumerate(as_completed(futures), 1):
+        if on_done:
+            on_done(n)
+    return [f.exception() or f.result() for f in futures]
+
+def seconds_to_hms_array(seconds) -> List[str]:
+    """Convert an array of seconds to [HH:MM:SS] strings in one pass."""
+    secs = np.asarray(seconds, dtype=np.float64).astype(np.int64)
+    h, rem = np.divmod(secs, 3600)
+    m, s = np.divmod(rem, 60)
+    return [f"[{a:02d}:{b:02d}:{c:02d}]" for a, b, c in zip(h.tolist(), m.tolist(), s.tolist())]
+
+class Word(msgspec.Struct):
+    """One diarized word from a Deepgram transcript"""
+    word: str
+    start: float
+    speaker: int = 0
+
+class Alternative(msgspec.Struct):
+    words: List[Word] = []
+
+class Channel(msgspec.Struct):
+    alternatives: List[Alternative]
+
+class Results(msgspec.Struct):
+    channels: List[Channel]
+
+class Transcription(msgspec.Struct):
+    """The parts of a Deepgram /v1/listen response the suite reads; other fields are skipped"""
+    results: Optional[Results] = None
+
+TRANSCRIPTION_DECODER = msgspec.json.Decoder(Transcription)
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+async def _iter_chunks(audio_file, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Yield an uploaded file in fixed-size chunks instead of one full copy"""
+    audio_file.seek(0)
+    while chunk := audio_file.read(chunk_size):
+        yield chunk
+
+UPLOAD_SAMPLE_RATE = 16000
+
+def _audio_format(audio_file):
+    """Sample rate and channel count of a recording's audio stream, probed without decoding it"""
+    audio_file.seek(0)
+    streams = mediainfo_json(audio_file)["streams"]
+    audio = next(stream for stream in streams if stream.get("codec_type") == "audio")
+    return int(audio["sample_rate"]), int(audio["channels"])
+
+def downsample_audio(audio_file):
+    """Re-encode a wideband or stereo recording as 16 kHz mono FLAC, returning it unchanged when that wouldn't shrink it"""
+    if AudioSegment is None:
+        return audio_file
+    try:
+        frame_rate, channels = _audio_format(audio_file)
+        if frame_rate <= UPLOAD_SAMPLE_RATE and channels == 1:
+            return audio_file
+        audio_file.seek(0)
+        segment = AudioSegment.from_file(audio_file).set_frame_rate(UPLOAD_SAMPLE_RATE).set_channels(1)
+        flac = io.BytesIO()
+        segment.export(flac, format="flac")
+    except Exception:
+        return audio_file
+    if flac.tell() >= audio_file.size:
+        return audio_file
+    flac.type = "audio/flac"
+    return flac
+
+async def transcribe_audio_async(client: httpx.AsyncClient, audio_file, deepgram_api_key: str, language: str = "hi") -> Transcription:
     """Transcribe audio using Deepgram API with diarization."""
+    response = await client.post(
+        "https://api.deepgram.com/v1/listen",
+        headers={
+            "Authorization": f"Token {deepgram_api_key}",
+            "Content-Type": getattr(audio_file, "type", None) or "audio/mpeg"
+        },
+        params={
+            "punctuate": "true",
+            "diarize": "true",
+            "language": language
+        },
+        content=_iter_chunks(audio_file)
+    )
+    
+    if response.status_code != 200:
+        raise RuntimeError(f"Transcription failed: {response.status_code} - {response.text}")
+    return TRANSCRIPTION_DECODER.decode(response.content)
+
+@st.cache_resource(show_spinner=False)
+def get_deepgram_client():
+    """Pooled HTTP client for Deepgram, kept alive across batches and reruns"""
+    return httpx.AsyncClient(
+        timeout=600,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    )
+
+TRANSCRIPT_CACHE_SIZE = 128
+
+@st.cache_resource(show_spinner=False)
+def _transcript_cache():
+    """Finished Deepgram transcriptions keyed on audio content hash and language"""
+    return OrderedDict()
+
+def _audio_digest(audio_file, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """SHA-256 of an uploaded file, read chunk by chunk"""
+    digest = hashlib.sha256()
+    audio_file.seek(0)
+    while chunk := audio_file.read(chunk_size):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+async def _upload_limited(client: httpx.AsyncClient, audio_file, deepgram_api_key: str, language: str, limit=None) -> Transcription:
+    """Downsample and upload one recording, waiting for a slot on limit if one is given"""
+    async with limit or contextlib.nullcontext():
+        if AudioSegment is not None:
+            audio_file = await asyncio.to_thread(downsample_audio, audio_file)
+        return await transcribe_audio_async(client, audio_file, deepgram_api_key, language)
+
+async def transcribe_cached_async(client: httpx.AsyncClient, audio_file, deepgram_api_key: str, language: str = "hi", limit=None) -> Transcription:
+    """Transcribe audio, reusing the finished or in-flight result for identical recordings"""
+    cache = _transcript_cache()
+    key = (_audio_digest(audio_file), language)
+    if key in cache:
+        cache.move_to_end(key)
+        entry = cache[key]
+        return await entry if isinstance(entry, asyncio.Future) else entry
+    
+    upload = asyncio.ensure_future(_upload_limited(client, audio_file, deepgram_api_key, language, limit))
+    cache[key] = upload
     try:
-        response = requests.post(
-            "https://api.deepgram.com/v1/listen",
-            headers={
-                "Authorization": f"Token {deepgram_api_key}",
-                "Content-Type": "audio/mpeg"
-            },
-            params={
-                "punctuate": "true",
-                "diarize": "true",
-                "language": language
-            },
-            data=audio_file
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Transcription failed: {response.status_code} - {response.text}")
-            return None
-    except Exception as e:
-        st.error(f"Error during transcription: {str(e)}")
-        return None
-
-def format_transcript(result: Dict) -> str:
+        result = await upload
+    except Exception:
+        if cache.get(key) is upload:
+            del cache[key]
+        raise
+    
+    cache[key] = result
+    while len(cache) > TRANSCRIPT_CACHE_SIZE:
+        cache.popitem(last=False)
+    return result
+
+MAX_CONCURRENT_TRANSCRIPTIONS = 8
+
+def run_transcriptions(files, deepgram_api_key: str, language: str = "hi", on_done=None) -> List[Transcription]:
+    """Transcribe all uploaded files concurrently, at most MAX_CONCURRENT_TRANSCRIPTIONS at a time"""
+    client = get_deepgram_client()
+    limit = asyncio.Semaphore(MAX_CONCURRENT_TRANSCRIPTIONS)
+    return run_async_each([
+        transcribe_cached_async(client, f, deepgram_api_key, language, limit)
+        for f in files
+    ], on_done)
+
+def format_transcript(result: Transcription) -> str:
     """Format transcript with speaker diarization and timestamps."""
-    if not result or "results" not in result:
+    if not result or result.results is None:
         return "No transcription available"
     
-    words = result["results"]["channels"][0]["alternatives"][0]["words"]
+    words = result.results.channels[0].alternatives[0].words
+    if not words:
+        return ""
     
-    # Group words by speaker
-    current_speaker = None
-    current_start = None
-    current_text = []
-    formatted_transcript = []
+    # Column-wise view of the words; a new speaker block starts wherever the speaker changes
+    speakers = np.fromiter((w.speaker for w in words), dtype=np.int32, count=len(words))
+    starts = np.fromiter((w.start for w in words), dtype=np.float64, count=len(words))
+    tokens = [w.word for w in words]
     
-    for word in words:
-        speaker = f"Speaker {word['speaker']+1}"
-        
-        if speaker != current_speaker:
-            # Add the last speaker block if exists
-            if current_speaker is not None:
-                formatted_transcript.append(
-                    f"{seconds_to_hms(current_start)} {current_speaker}: \"{' '.join(current_text)}\""
-                )
-            
-            # Start a new speaker block
-            current_speaker = speaker
-            current_start = word["start"]
-            current_text = [word["word"]]
-        else:
-            current_text.append(word["word"])
+    block_starts = np.flatnonzero(np.diff(speakers, prepend=speakers[0] - 1))
+    block_ends = np.append(block_starts[1:], len(words))
+    timestamps = seconds_to_hms_array(starts[block_starts])
     
-    # Add the last block
-    if current_text:
-        formatted_transcript.append(
-            f"{seconds_to_hms(current_start)} {current_speaker}: \"{' '.join(current_text)}\""
+    formatted_transcript = [
+        f"{timestamp} Speaker {speaker + 1}: \"{' '.join(tokens[b:e])}\""
+        for timestamp, speaker, b, e in zip(
+            timestamps, speakers[block_starts].tolist(), block_starts.tolist(), block_ends.tolist()
         )
-    
+    ]
     return "\n".join(formatted_transcript)
 
-def generate_primary_prompt(script_content, template_content, agent_details, model):
-    """Generate the primary prompt using script, template and agent details"""
-    try:
-        instructions = f"""
+DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _docx_to_text(data: bytes) -> str:
+    """Extract paragraph text from a .docx file"""
+    with zipfile.ZipFile(io.BytesIO(data)) as docx:
+        root = ElementTree.fromstring(docx.read("word/document.xml"))
+    return "\n".join(
+        "".join(node.text or "" for node in para.iter(f"{DOCX_NS}t"))
+        for para in root.iter(f"{DOCX_NS}p")
+    )
+
+MAX_TEXT_UPLOAD_BYTES = 2 * 1024 * 1024
+TEXT_PREVIEW_CHARS = 4096
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_text(file_id: str, name: str, _upload) -> str:
+    """Decode an uploaded script/template, memoized per upload"""
+    data = _upload.getvalue()
+    if name.lower().endswith('.docx'):
+        return _docx_to_text(data)
+    return data.decode('utf-8')
+
+def decode_uploads(files) -> List:
+    """Decode several uploaded text files concurrently, returning each text or the exception it raised"""
+    def decode(f):
+        try:
+            if f.size > MAX_TEXT_UPLOAD_BYTES:
+                raise ValueError(f"file is larger than {MAX_TEXT_UPLOAD_BYTES // (1024 * 1024)} MB")
+            return load_text(f.file_id, f.name, f)
+        except Exception as e:
+            return e
+    
+    if len(files) < 2:
+        return [decode(f) for f in files]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        return list(executor.map(decode, files))
+
+PRIMARY_PROMPT_TEMPLATE = string.Template("""
+
 You are an expert AI prompt engineer specializing in creating CASE-SPECIFIC prompts for AI calling agents. 
 Your task is to analyze a provided script and fill a universal template to create a CUSTOMIZED, ready-to-use PRIMARY prompt for that specific use case.
 
 AGENT DETAILS TO INCORPORATE:
-- Agent Name: {agent_details.get('name', 'Agent')}
-- Company: {agent_details.get('company', 'Company')}
-- Language: {agent_details.get('language', 'Hinglish')}
-- Category: {agent_details.get('category', 'General')}
+- Agent Name: $agent_name
+- Company: $company
+- Language: $language
+- Category: $category
 
 CRITICAL REQUIREMENTS:
 1. The final output MUST be a CASE-SPECIFIC prompt, not a generic template
@@ -245,13 +432,13 @@ CRITICAL REQUIREMENTS:
    - **Standard Objection Handling**
    - **Fundamental Guidelines for Responses**
    - **Numeric & Language Best Practices**
-   - **Guidelines for Conversation in {agent_details.get('language', 'Hinglish')}**
+   - **Guidelines for Conversation in $language**
    - **Strict Guidelines**
 
 4. Create a COMPLETE, WORKING prompt that can be used immediately for that specific calling scenario
-5. Incorporate the agent name "{agent_details.get('name', 'Agent')}" throughout the prompt
-6. Set the language appropriately for "{agent_details.get('language', 'Hinglish')}"
-7. Customize for the "{agent_details.get('category', 'General')}" use case
+5. Incorporate the agent name "$agent_name" throughout the prompt
+6. Set the language appropriately for "$language"
+7. Customize for the "$category" use case
 
 ANALYSIS AND EXTRACTION PROCESS:
 1. **Extract Key Information** from the script:
@@ -277,41 +464,48 @@ ANALYSIS AND EXTRACTION PROCESS:
    - Include script-specific dialogue examples
 
 The output should be a COMPLETE, CASE-SPECIFIC PRIMARY prompt that an AI agent can use immediately.
-"""
-        
-        full_prompt = f"""
-{instructions}
+
 
 SCRIPT TO ANALYZE:
-{script_content}
+$script_content
 
 UNIVERSAL TEMPLATE TO CUSTOMIZE:
-{template_content}
+$template_content
 
 TASK: Create a PRIMARY AI calling agent prompt by filling the template with script information and agent details. This will be improved later based on real call insights.
 
 Generate a complete, ready-to-use, case-specific PRIMARY AI calling agent prompt in Markdown format.
-"""
-        
+""")
+
+def primary_prompt_request(script_content, template_content, agent_details) -> str:
+    """Build the Gemini request for the primary prompt from script, template and agent details"""
+    return PRIMARY_PROMPT_TEMPLATE.substitute(
+        agent_name=agent_details.get('name', 'Agent'),
+        company=agent_details.get('company', 'Company'),
+        language=agent_details.get('language', 'Hinglish'),
+        category=agent_details.get('category', 'General'),
+        script_content=script_content,
+        template_content=template_content
+    )
+
+def generate_primary_prompt(script_content, template_content, agent_details, model):
+    """Generate the primary prompt using script, template and agent details"""
+    try:
         with st.spinner("🤖 Generating PRIMARY prompt..."):
-            response = model.generate_content(full_prompt)
-            return response.text
+            return stream_generate(primary_prompt_request(script_content, template_content, agent_details), model)
     
     except Exception as e:
         st.error(f"Error generating primary prompt: {str(e)}")
         return None
 
-def extract_call_insights(transcript: str, primary_prompt: str, model):
-    """Extract actionable insights from call transcript to improve the prompt"""
-    try:
-        analysis_prompt = f"""
+INSIGHTS_PROMPT_TEMPLATE = string.Template("""
 You are an expert call analysis consultant. Analyze this call transcript against the current AI agent prompt and extract SPECIFIC, ACTIONABLE insights that can be used to improve the prompt.
 
 **CURRENT PRIMARY PROMPT:**
-{primary_prompt}
+$primary_prompt
 
 **ACTUAL CALL TRANSCRIPT:**
-{transcript}
+$transcript
 
 Please provide insights in the following JSON-like format for easy integration:
 
@@ -345,35 +539,88 @@ Please provide insights in the following JSON-like format for easy integration:
 [Specific behavioral patterns, timing, or techniques that the AI should learn]
 
 Focus on SPECIFIC, IMPLEMENTABLE insights that can directly improve the AI agent prompt.
-"""
-        
-        with st.spinner("🔍 Extracting insights from call..."):
-            response = model.generate_content(analysis_prompt)
-            return response.text
+""")
+
+async def extract_call_insights_async(transcript: str, primary_prompt: str, model):
+    """Extract actionable insights from call transcript to improve the prompt"""
+    analysis_prompt = INSIGHTS_PROMPT_TEMPLATE.substitute(
+        primary_prompt=primary_prompt,
+        transcript=transcript
+    )
     
-    except Exception as e:
-        st.error(f"Error extracting insights: {str(e)}")
-        return None
+    response = await model.generate_content_async(analysis_prompt)
+    return response.text
+
+async def _extract_cached(transcript: str, primary_prompt: str, model, key, limit=None) -> str:
+    """Extract insights for one call, reusing a finished completion under key or waiting for a slot on limit"""
+    text = cached_completion(key)
+    if text is None:
+        async with limit or contextlib.nullcontext():
+            text = await extract_call_insights_async(transcript, primary_prompt, model)
+        remember_completion(key, text)
+    return text
+
+MAX_CONCURRENT_EXTRACTIONS = 8
+
+PROMPT_CACHE_TTL = timedelta(hours=1)
+CACHED_PRIMARY_PROMPT_REF = "(Provided above in the cached context.)"
+
+@st.cache_resource(show_spinner=False, ttl=PROMPT_CACHE_TTL - timedelta(minutes=5))
+def _create_prompt_cache(api_key, primary_prompt: str):
+    """Create the primary prompt's context cache under api_key (raises, so failures aren't memoized)"""
+    with using_gemini_key(api_key):
+        return caching.CachedContent.create(
+            model=GEMINI_MODEL,
+            display_name="primary-prompt",
+            contents=[primary_prompt],
+            ttl=PROMPT_CACHE_TTL
+        )
 
-def generate_master_prompt(primary_prompt: str, all_insights: List[str], agent_details, model):
-    """Generate the final master prompt using primary prompt and all collected insights"""
+def get_primary_prompt_cache(api_key, primary_prompt: str):
+    """Primary prompt in Gemini's context cache for batch analysis, or None to send it inline"""
     try:
-        combined_insights = "\n\n---\n\n".join(all_insights)
-        
-        master_prompt_instructions = f"""
+        return _create_prompt_cache(api_key, primary_prompt)
+    except Exception:
+        return None
+
+@st.cache_resource(show_spinner=False, ttl=PROMPT_CACHE_TTL)
+def get_cached_prompt_model(cache_name: str, _prompt_cache, _model):
+    """Gemini model bound to a cached primary prompt, sharing _model's key (built once per cache)"""
+    cached_model = genai.GenerativeModel.from_cached_content(_prompt_cache)
+    cached_model._client, cached_model._async_client = _model._client, _model._async_client
+    return cached_model
+
+def extract_all(transcripts: List[str], primary_prompt: str, model, prompt_cache=None, on_done=None) -> List[str]:
+    """Extract insights from all transcripts, at most MAX_CONCURRENT_EXTRACTIONS at a time, reusing memoized completions"""
+    prompt_digest = hashlib.sha256(primary_prompt.encode()).hexdigest()
+    keys = [
+        (model.model_name, prompt_digest, hashlib.sha256(t.encode()).hexdigest())
+        for t in transcripts
+    ]
+    
+    if prompt_cache is not None:
+        model = get_cached_prompt_model(prompt_cache.name, prompt_cache, model)
+        primary_prompt = CACHED_PRIMARY_PROMPT_REF
+    
+    limit = asyncio.Semaphore(MAX_CONCURRENT_EXTRACTIONS)
+    return run_async_each([
+        _extract_cached(t, primary_prompt, model, key, limit) for t, key in zip(transcripts, keys)
+    ], on_done)
+
+MASTER_PROMPT_TEMPLATE = string.Template("""
 You are an expert AI prompt engineer. Your task is to create a MASTER AI calling agent prompt by improving the PRIMARY prompt using insights from multiple real call recordings.
 
 AGENT DETAILS:
-- Agent Name: {agent_details.get('name', 'Agent')}
-- Company: {agent_details.get('company', 'Company')}
-- Language: {agent_details.get('language', 'Hinglish')}
-- Category: {agent_details.get('category', 'General')}
+- Agent Name: $agent_name
+- Company: $company
+- Language: $language
+- Category: $category
 
 **PRIMARY PROMPT (BASELINE):**
-{primary_prompt}
+$primary_prompt
 
 **INSIGHTS FROM REAL CALLS:**
-{combined_insights}
+$combined_insights
 
 **YOUR TASK:**
 Create a MASTER prompt that:
@@ -406,31 +653,55 @@ Create a MASTER prompt that:
   * ### **Standard Objection Handling**
   * ### **Fundamental Guidelines for Responses**
   * ### **Numeric & Language Best Practices**
-  * ### **Guidelines for Conversation in {agent_details.get('language', 'Hinglish')}**
+  * ### **Guidelines for Conversation in $language**
   * ### **Strict Guidelines**
 
 Generate the FINAL MASTER AI calling agent prompt that represents the evolution from theory (primary prompt) to practice (real call insights).
-"""
-        
+""")
+
+INSIGHTS_SEPARATOR = "\n\n---\n\n"
+MASTER_PROMPT_HEAD, MASTER_PROMPT_TAIL = (
+    string.Template(part) for part in MASTER_PROMPT_TEMPLATE.template.split("$combined_insights")
+)
+
+def master_prompt_instructions(primary_prompt: str, all_insights: List[str], agent_details) -> str:
+    """Build the Gemini request for the master prompt from the primary prompt and call insights"""
+    fields = {
+        'agent_name': agent_details.get('name', 'Agent'),
+        'company': agent_details.get('company', 'Company'),
+        'language': agent_details.get('language', 'Hinglish'),
+        'category': agent_details.get('category', 'General'),
+        'primary_prompt': primary_prompt
+    }
+
+    # Write the insights straight into the prompt buffer rather than joining them first
+    buf = io.StringIO()
+    buf.write(MASTER_PROMPT_HEAD.substitute(fields))
+    for i, insight in enumerate(all_insights):
+        if i:
+            buf.write(INSIGHTS_SEPARATOR)
+        buf.write(insight)
+    buf.write(MASTER_PROMPT_TAIL.substitute(fields))
+    return buf.getvalue()
+
+def generate_master_prompt(primary_prompt: str, all_insights: List[str], agent_details, model):
+    """Generate the final master prompt using primary prompt and all collected insights"""
+    try:
         with st.spinner("🧠 Creating MASTER prompt from insights..."):
-            response = model.generate_content(master_prompt_instructions)
-            return response.text
+            return stream_generate(master_prompt_instructions(primary_prompt, all_insights, agent_details), model)
     
     except Exception as e:
         st.error(f"Error generating master prompt: {str(e)}")
         return None
 
-def refine_master_prompt(current_prompt: str, user_feedback: str, model):
-    """Refine the master prompt based on user feedback"""
-    try:
-        refinement_prompt = f"""
+REFINE_PROMPT_TEMPLATE = string.Template("""
 You are an expert AI prompt engineer. A user has provided feedback about issues with their current master prompt. Your task is to update the prompt to address their concerns while maintaining the overall structure and quality.
 
 **CURRENT MASTER PROMPT:**
-{current_prompt}
+$current_prompt
 
 **USER FEEDBACK/ISSUE:**
-{user_feedback}
+$user_feedback
 
 **YOUR TASK:**
 1. Analyze the user's feedback to understand the specific issue
@@ -448,85 +719,457 @@ You are an expert AI prompt engineer. A user has provided feedback about issues
 - Provide a complete, updated prompt
 
 Generate the REFINED master prompt with the requested improvements.
-"""
+""")
+
+def refine_master_prompt(current_prompt: str, user_feedback: str, model):
+    """Refine the master prompt based on user feedback"""
+    try:
+        refinement_prompt = REFINE_PROMPT_TEMPLATE.substitute(
+            current_prompt=current_prompt,
+            user_feedback=user_feedback
+        )
         
         with st.spinner("🔧 Refining master prompt..."):
-            response = model.generate_content(refinement_prompt)
-            return response.text
+            return stream_generate(refinement_prompt, model)
     
     except Exception as e:
         st.error(f"Error refining prompt: {str(e)}")
         return None
 
+EVOLUTION_PROMPT_TEMPLATE = string.Template("""
+Compare these AI agent prompts and provide a detailed analysis of how the prompt evolved from theory to practice:
+
+**AGENT DETAILS:**
+- Name: $agent_name
+- Company: $company
+- Language: $language
+- Category: $category
+
+**ORIGINAL PRIMARY PROMPT:**
+$primary_prompt
+
+**EVOLVED MASTER PROMPT:**
+$master_prompt
+
+**EVOLUTION PROCESS:**
+- Insights used: $n_calls real call recordings analyzed
+- Refinements made: $n_refinements iterative improvements
+
+Please provide analysis in this format:
+
+## 📊 PROMPT EVOLUTION ANALYSIS
+
+### ✅ Key Improvements Made:
+[List specific improvements from primary to master]
+
+### 🎯 New Elements Added:
+[List new elements that weren't in the primary prompt]
+
+### 💬 Enhanced Dialogue Examples:
+[Compare dialogue examples between versions]
+
+### 🔄 Improved Objection Handling:
+[How objection handling was enhanced]
+
+### 📈 Practical Enhancements:
+[Real-world improvements based on call insights]
+
+### 🎭 Behavioral Improvements:
+[How the AI agent behavior was refined]
+
+### 🔧 Refinement Impact:
+[How iterative refinements improved the prompt]
+
+### 📊 Evolution Metrics:
+- Comprehensiveness: Estimate % increase
+- Practical Examples: Count new examples added
+- Objection Coverage: Count new objections covered
+- Dialogue Quality: Improvements made
+- Structure Completeness: All required sections present
+
+### 💡 Key Learnings:
+[What this evolution teaches us about AI prompt development]
+""")
+
+def generate_evolution_analysis(primary_prompt: str, master_prompt: str, agent_details, n_calls: int, n_refinements: int, model) -> str:
+    """Stream an analysis of how the master prompt evolved from the primary prompt"""
+    name, company, language, category = (agent_details.get(field, 'N/A') for field in AGENT_FIELDS)
+    evolution_prompt = EVOLUTION_PROMPT_TEMPLATE.substitute(
+        agent_name=name,
+        company=company,
+        language=language,
+        category=category,
+        primary_prompt=primary_prompt,
+        master_prompt=master_prompt,
+        n_calls=n_calls,
+        n_refinements=n_refinements
+    )
+    return stream_generate(evolution_prompt, model)
+
+@st.cache_resource(show_spinner=False)
+def get_css():
+    """Load the app stylesheet once per process"""
+    return (ASSETS_DIR / "style.css").read_text()
+
+@st.cache_resource(show_spinner=False)
+def get_help():
+    """Load the How to Use guide once per process"""
+    return (ASSETS_DIR / "help.md").read_text()
+
+BLOB_STORE_SIZE = 64
+
+@st.cache_resource(show_spinner=False)
+def blob_store():
+    """UTF-8 encoded download payloads keyed by content id, shared across reruns, and the lock guarding them"""
+    return OrderedDict(), threading.Lock()
+
+def store_blob(text: str) -> str:
+    """Encode text for download once and return its blob store id"""
+    data = text.encode()
+    key = hashlib.sha1(data).hexdigest()[:16]
+    store, lock = blob_store()
+    with lock:
+        store[key] = data
+        store.move_to_end(key)
+        while len(store) > BLOB_STORE_SIZE:
+            store.popitem(last=False)
+    return key
+
+def get_blob(key, text: str) -> bytes:
+    """Download payload for key, re-encoding text if it has been evicted"""
+    store, lock = blob_store()
+    with lock:
+        data = store.get(key) if key else None
+    return data if data is not None else text.encode()
+
+CALLS_PER_PAGE = 20
+
+def combined_insights(call_insights) -> str:
+    """Markdown of every call's insights, appending only calls analyzed since the last build"""
+    ss = st.session_state
+    count, text = ss.combined_insights_count, ss.combined_insights
+    if count > len(call_insights):
+        count, text = 0, ""
+    
+    for i in range(count, len(call_insights)):
+        call = call_insights[i]
+        text += ("\n\n" + "="*50 if i == 0 else "\n\n") + f"# CALL {i+1}: {call['filename']}\n\n{call['insights']}"
+    
+    st.session_state.combined_insights = text
+    st.session_state.combined_insights_count = len(call_insights)
+    return text
+
+def insights_zip(call_insights) -> bytes:
+    """ZIP archive with one markdown file per call's insights"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, call in enumerate(call_insights, 1):
+            archive.writestr(f"call_{i}_{Path(call['filename']).stem}.md", call['insights'])
+    return buf.getvalue()
+
+@dataclass(slots=True)
+class Refinement:
+    """One Phase 4 refinement of the master prompt"""
+    timestamp: datetime
+    feedback: str
+    summary: str
+    old_prompt: str
+    new_prompt: str
+    label: str = field(init=False)
+
+    def __post_init__(self):
+        self.label = self.timestamp.strftime('%Y-%m-%d %H:%M')
+
+def file_stamp(moment: Optional[datetime] = None) -> str:
+    """Download filename timestamp for when an artifact was produced (now if unknown)"""
+    return (moment or datetime.now()).strftime("%Y%m%d_%H%M%S")
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def evolution_timeline(agent_name: str, category: str, n_calls: int, feedbacks: tuple) -> pd.DataFrame:
+    """Final Results timeline table, rebuilt only when its inputs change"""
+    timeline_data = []
+    timeline_data.append({"Phase": "Phase 1", "Action": "Primary Prompt Created", "Details": f"Agent: {agent_name}, Category: {category}"})
+    timeline_data.append({"Phase": "Phase 2", "Action": f"{n_calls} Calls Analyzed", "Details": "Real call insights extracted"})
+    timeline_data.append({"Phase": "Phase 3", "Action": "Master Prompt Generated", "Details": "Combined insights with primary prompt"})
+    
+    for i, feedback in enumerate(feedbacks, 1):
+        timeline_data.append({"Phase": f"Phase 4.{i}", "Action": f"Refinement {i}", "Details": feedback[:50] + "..."})
+    
+    return pd.DataFrame(timeline_data)
+
+def build_evolution_package(primary: str, master: str, agent_details, call_insights, refinement_history, generated_at: datetime) -> str:
+    """Markdown for the Complete Evolution Package download, written section by section into one buffer"""
+    version = len(refinement_history) + 1
+    name, company, language, category = (agent_details.get(field, 'N/A') for field in AGENT_FIELDS)
+    buf = io.StringIO()
+    buf.write(f"""# AI Prompt Evolution Complete Package
+
+Generated on: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}
+
+## 📊 Evolution Summary
+
+- **Phases Completed:** 4/4
+- **Agent Name:** {name}
+- **Company:** {company}
+- **Language:** {language}
+- **Category:** {category}
+- **Calls Analyzed:** {len(call_insights)}
+- **Refinements Made:** {len(refinement_history)}
+- **Final Version:** v{version}
+
+## 📝 Original Primary Prompt (v1)
+
+""")
+    buf.write(primary)
+    buf.write("""
+
+---
+
+## 🔍 Call Insights Used
+
+""")
+    for i, call in enumerate(call_insights):
+        if i:
+            buf.write(NL)
+        buf.write(f"### Call {i+1}: {call['filename']}{NL}{call['insights']}{NL}")
+    buf.write("""
+
+---
+""")
+    
+    if refinement_history:
+        buf.write("""
+
+## 🔧 Refinement History
+
+""")
+        for i, refinement in enumerate(refinement_history, 1):
+            if i > 1:
+                buf.write(NL)
+            buf.write(f"### Refinement {i}: {refinement.label}{NL}**Issue:** {refinement.feedback}{NL}**Summary:** {refinement.summary}{NL}")
+        buf.write(NL)
+    
+    buf.write(f"""
+---
+
+## 🧠 Final Master Prompt (v{version})
+
+""")
+    buf.write(master)
+    buf.write("""
+
+---
+
+*Generated by AI Prompt Evolution Suite - Complete 4-Phase Evolution Process*
+""")
+    return buf.getvalue()
+
+PROMPT_PREVIEW_CHARS = 50_000
+
+def preview_text(text: str, limit: int) -> str:
+    """The first limit characters of text, noting how much was left out"""
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n\n… truncated, {len(text) - limit:,} more characters"
+
+def show_prompt(text: str, key: str):
+    """Show a prompt (cut to PROMPT_PREVIEW_CHARS) as a code block, rendering it as markdown only on request"""
+    text = preview_text(text, PROMPT_PREVIEW_CHARS)
+    if st.toggle("Render as markdown", key=key):
+        st.markdown(text)
+    else:
+        st.code(text, language="markdown")
+
+def _workflow_card(step_class, title, detail):
+    """HTML for one workflow progress card"""
+    return f'<div class="workflow-step {step_class}" style="flex: 1"><strong>{title}</strong><br>{detail}</div>'
+
 def display_workflow_progress():
     """Display the current workflow progress"""
     st.markdown("### 🔄 Workflow Progress")
     
-    col1, col2, col3, col4 = st.columns(4)
+    ss = st.session_state
+    primary, master, call_insights, phase = ss.primary_prompt, ss.master_prompt, ss.call_insights, ss.current_phase
     
-    with col1:
-        if st.session_state.primary_prompt:
-            st.markdown('<div class="workflow-step completed-step">', unsafe_allow_html=True)
-            st.markdown("**✅ Phase 1: COMPLETED**")
-            st.markdown("Primary Prompt Generated")
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            step_class = "current-step" if st.session_state.current_phase == 1 else "workflow-step"
-            st.markdown(f'<div class="workflow-step {step_class}">', unsafe_allow_html=True)
-            st.markdown("**📝 Phase 1: Create Primary**")
-            st.markdown("Agent Details + Script + Template")
-            st.markdown('</div>', unsafe_allow_html=True)
+    cards = []
     
-    with col2:
-        if len(st.session_state.call_insights) > 0:
-            st.markdown('<div class="workflow-step completed-step">', unsafe_allow_html=True)
-            st.markdown(f"**✅ Phase 2: COMPLETED**")
-            st.markdown(f"Analyzed {len(st.session_state.call_insights)} calls")
-            st.markdown('</div>', unsafe_allow_html=True)
-        elif st.session_state.primary_prompt:
-            step_class = "current-step" if st.session_state.current_phase == 2 else "workflow-step"
-            st.markdown(f'<div class="workflow-step {step_class}">', unsafe_allow_html=True)
-            st.markdown("**🎵 Phase 2: Extract Insights**")
-            st.markdown("Upload Call Recordings")
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div class="workflow-step">', unsafe_allow_html=True)
-            st.markdown("**⏳ Phase 2: Waiting**")
-            st.markdown("Extract Insights")
-            st.markdown('</div>', unsafe_allow_html=True)
+    if primary:
+        cards.append(_workflow_card("completed-step", "✅ Phase 1: COMPLETED", "Primary Prompt Generated"))
+    else:
+        step_class = "current-step" if phase == 1 else ""
+        cards.append(_workflow_card(step_class, "📝 Phase 1: Create Primary", "Agent Details + Script + Template"))
     
-    with col3:
-        if st.session_state.master_prompt:
-            st.markdown('<div class="workflow-step completed-step">', unsafe_allow_html=True)
-            st.markdown("**✅ Phase 3: COMPLETED**")
-            st.markdown("Master Prompt Ready!")
-            st.markdown('</div>', unsafe_allow_html=True)
-        elif len(st.session_state.call_insights) > 0:
-            step_class = "current-step" if st.session_state.current_phase == 3 else "workflow-step"
-            st.markdown(f'<div class="workflow-step {step_class}">', unsafe_allow_html=True)
-            st.markdown("**🧠 Phase 3: Create Master**")
-            st.markdown("Generate Final Prompt")
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div class="workflow-step">', unsafe_allow_html=True)
-            st.markdown("**⏳ Phase 3: Waiting**")
-            st.markdown("Create Master Prompt")
-            st.markdown('</div>', unsafe_allow_html=True)
+    if len(call_insights) > 0:
+        cards.append(_workflow_card("completed-step", "✅ Phase 2: COMPLETED", f"Analyzed {len(call_insights)} calls"))
+    elif primary:
+        step_class = "current-step" if phase == 2 else ""
+        cards.append(_workflow_card(step_class, "🎵 Phase 2: Extract Insights", "Upload Call Recordings"))
+    else:
+        cards.append(_workflow_card("", "⏳ Phase 2: Waiting", "Extract Insights"))
     
-    with col4:
-        if st.session_state.master_prompt:
-            step_class = "current-step" if st.session_state.current_phase == 4 else "workflow-step"
-            st.markdown(f'<div class="workflow-step {step_class}">', unsafe_allow_html=True)
-            st.markdown("**🔧 Phase 4: Refine**")
-            st.markdown("Test & Improve")
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div class="workflow-step">', unsafe_allow_html=True)
-            st.markdown("**⏳ Phase 4: Waiting**")
-            st.markdown("Test & Refine")
-            st.markdown('</div>', unsafe_allow_html=True)
+    if master:
+        cards.append(_workflow_card("completed-step", "✅ Phase 3: COMPLETED", "Master Prompt Ready!"))
+    elif len(call_insights) > 0:
+        step_class = "current-step" if phase == 3 else ""
+        cards.append(_workflow_card(step_class, "🧠 Phase 3: Create Master", "Generate Final Prompt"))
+    else:
+        cards.append(_workflow_card("", "⏳ Phase 3: Waiting", "Create Master Prompt"))
+    
+    if master:
+        step_class = "current-step" if phase == 4 else ""
+        cards.append(_workflow_card(step_class, "🔧 Phase 4: Refine", "Test & Improve"))
+    else:
+        cards.append(_workflow_card("", "⏳ Phase 4: Waiting", "Test & Refine"))
+    
+    # One element for all four cards instead of a column and four markdown calls per phase
+    st.markdown(f'<div style="display: flex; gap: 1rem">{"".join(cards)}</div>', unsafe_allow_html=True)
+
+@st.fragment
+def evolution_comparison(primary: str, master: str, agent_details, call_insights, refinement_history, model):
+    """Final Results comparison tabs and package download, rerun on their own as a fragment"""
+    ss = st.session_state
+    final_version = len(refinement_history) + 1
+    
+    # Comparison tabs
+    st.markdown("### 🔍 Evolution Comparison")
+
+    compare_tab1, compare_tab2, compare_tab3, compare_tab4 = st.tabs([
+        "📝 Primary Prompt (v1)", 
+        "🧠 Master Prompt (Final)", 
+        "📊 Evolution Analysis",
+        "🔄 Refinement History"
+    ], key="compare_tab", on_change="rerun")
+
+    # Only the selected comparison view is built on each run
+
+    if compare_tab1.open:
+        with compare_tab1:
+            st.markdown("#### Original Primary Prompt (Version 1)")
+            show_prompt(primary, key="render_primary_final")
+
+            st.download_button(
+                "📥 Download Primary Prompt",
+                get_blob(ss.primary_prompt_id, primary),
+                file_name=f"primary_prompt_v1_{file_stamp(ss.primary_prompt_ts)}.md",
+                mime="text/markdown",
+                key=f"download_final_primary_{ss.primary_prompt_id}"
+            )
+
+    if compare_tab2.open:
+        with compare_tab2:
+            st.markdown(f"#### Final Master Prompt (Version {final_version})")
+            show_prompt(master, key="render_master_final")
+
+            st.download_button(
+                "📥 Download Final Master Prompt",
+                get_blob(ss.master_prompt_id, master),
+                file_name=f"master_prompt_final_v{final_version}_{file_stamp(ss.master_prompt_ts)}.md",
+                mime="text/markdown",
+                key=f"download_final_master_{ss.master_prompt_id}"
+            )
+
+    if compare_tab3.open:
+        with compare_tab3:
+            st.markdown("#### Evolution Analysis")
+
+            # Generate evolution analysis
+            evolution_key = (ss.primary_prompt_id, ss.master_prompt_id, len(call_insights), len(refinement_history))
+            if st.button("📊 Generate Evolution Analysis", type="secondary"):
+                if model is not None:
+                    with st.spinner("Analyzing prompt evolution..."):
+                        analysis = generate_evolution_analysis(
+                            primary,
+                            master,
+                            agent_details,
+                            len(call_insights),
+                            len(refinement_history),
+                            model
+                        )
+                    st.session_state.evolution_analysis = (evolution_key, analysis, datetime.now(), store_blob(analysis))
+                    # Swap the streamed draft for the stored analysis and its download button
+                    st.rerun(scope="fragment")
+                else:
+                    st.error("❌ Please configure Gemini API key")
+
+            # Keep showing the analysis until the prompts it describes change
+            if ss.evolution_analysis and ss.evolution_analysis[0] == evolution_key:
+                _, analysis, analyzed_at, analysis_id = ss.evolution_analysis
+                st.markdown(analysis)
+
+                # Download evolution analysis
+                st.download_button(
+                    "📥 Download Evolution Analysis",
+                    get_blob(analysis_id, analysis),
+                    file_name=f"evolution_analysis_{file_stamp(analyzed_at)}.md",
+                    mime="text/markdown",
+                    key=f"download_evolution_analysis_{analysis_id}"
+                )
+
+    if compare_tab4.open:
+        with compare_tab4:
+            st.markdown("#### Refinement History")
+
+            if not refinement_history:
+                st.info("No refinements made yet. All improvements came from call insights analysis.")
+            else:
+                # Like the call expanders, a refinement's details only run while it is open
+                for i, refinement in enumerate(refinement_history, 1):
+                    refinement_expander = st.expander(
+                        f"🔧 Refinement {i}: {refinement.label}",
+                        expanded=False,
+                        key=f"refinement_expander_{i}",
+                        on_change="rerun"
+                    )
+                    if not refinement_expander.open:
+                        continue
+
+                    with refinement_expander:
+                        col1, col2 = st.columns([1, 1])
+                        with col1:
+                            st.markdown("**Issue Reported:**")
+                            st.write(refinement.feedback)
+
+                        with col2:
+                            st.markdown("**Changes Summary:**")
+                            st.code(refinement.summary, language=None)
+
+                        # Show before/after comparison for this refinement
+                        ref_tab1, ref_tab2 = st.tabs([f"Before v{i}", f"After v{i+1}"])
+
+                        with ref_tab1:
+                            st.code(refinement.old_prompt, language="markdown", height=200, wrap_lines=True)
+
+                        with ref_tab2:
+                            st.code(refinement.new_prompt, language="markdown", height=200, wrap_lines=True)
+
+    # Final download package
+    st.markdown("---")
+    st.markdown("### 📦 Complete Package Download")
+
+    # The package is only assembled once the button is clicked, from a snapshot of this run's state
+    package_inputs = (primary, master, dict(agent_details), list(call_insights), list(refinement_history))
+    st.download_button(
+        "📦 Download Complete Evolution Package",
+        lambda: build_evolution_package(*package_inputs, datetime.now()),
+        file_name=f"ai_prompt_evolution_package_{file_stamp(ss.master_prompt_ts)}.md",
+        mime="text/markdown",
+        use_container_width=True,
+        type="primary",
+        key="download_complete_package"
+    )
 
 def main():
+    # Bind session state once per run; writes still go through st.session_state
+    ss = st.session_state
+    primary, master = ss.primary_prompt, ss.master_prompt
+    call_insights, refinement_history = ss.call_insights, ss.refinement_history
+    agent_details = ss.agent_details
+    final_version = len(refinement_history) + 1
+    detail_name, detail_company, detail_language, detail_category = (agent_details.get(field, 'N/A') for field in AGENT_FIELDS)
+    
+    # Custom CSS for better styling
+    st.markdown(f"<style>{get_css()}</style>", unsafe_allow_html=True)
+    
     # Main header
     st.markdown('<h1 class="main-header">🧠 AI Prompt Evolution Suite</h1>', unsafe_allow_html=True)
     
@@ -574,7 +1217,7 @@ def main():
         model = None
         if gemini_key:
             model = configure_gemini(gemini_key)
-            if st.session_state.api_configured:
+            if model is not None:
                 st.success("✅ Gemini AI configured!")
             else:
                 st.error("❌ Failed to configure Gemini AI")
@@ -589,14 +1232,17 @@ def main():
         
         st.markdown("---")
         st.markdown("### 📊 Progress Summary")
-        st.write(f"**Agent Details:** {'✅' if st.session_state.agent_details else '❌'}")
-        st.write(f"**Primary Prompt:** {'✅' if st.session_state.primary_prompt else '❌'}")
-        st.write(f"**Call Insights:** {len(st.session_state.call_insights)} collected")
-        st.write(f"**Master Prompt:** {'✅' if st.session_state.master_prompt else '❌'}")
-        st.write(f"**Refinements:** {len(st.session_state.refinement_history)} made")
+        st.write(f"**Agent Details:** {'✅' if agent_details else '❌'}")
+        st.write(f"**Primary Prompt:** {'✅' if primary else '❌'}")
+        st.write(f"**Call Insights:** {len(call_insights)} collected")
+        st.write(f"**Master Prompt:** {'✅' if master else '❌'}")
+        st.write(f"**Refinements:** {len(refinement_history)} made")
         
         if st.button("🔄 Reset All Progress", type="secondary"):
-            for key in ['primary_prompt', 'master_prompt', 'call_insights', 'transcriptions', 'agent_details', 'refinement_history', 'refinement_chat']:
+            # Forget the primary prompt's completion so generating it again asks Gemini
+            if st.session_state.primary_prompt_key:
+                forget_completion(st.session_state.primary_prompt_key)
+            for key in ['primary_prompt', 'master_prompt', 'primary_prompt_id', 'master_prompt_id', 'primary_prompt_key', 'primary_prompt_ts', 'master_prompt_ts', 'call_insights', 'agent_details', 'refinement_history', 'combined_insights', 'combined_insights_count', 'evolution_analysis']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.session_state.current_phase = 1
@@ -616,7 +1262,7 @@ def main():
     with tab1:
         st.markdown('<div class="phase-header">📝 Phase 1: Create Primary Prompt</div>', unsafe_allow_html=True)
         
-        if st.session_state.primary_prompt:
+        if primary:
             st.markdown("""
             <div class="success-box">
                 <strong>✅ Phase 1 Completed!</strong><br>
@@ -625,25 +1271,25 @@ def main():
             """, unsafe_allow_html=True)
             
             # Show agent details
-            if st.session_state.agent_details:
+            if agent_details:
                 with st.expander("👤 Agent Details", expanded=False):
                     col1, col2 = st.columns(2)
                     with col1:
-                        st.write(f"**Name:** {st.session_state.agent_details.get('name', 'N/A')}")
-                        st.write(f"**Company:** {st.session_state.agent_details.get('company', 'N/A')}")
+                        st.write(f"**Name:** {detail_name}")
+                        st.write(f"**Company:** {detail_company}")
                     with col2:
-                        st.write(f"**Language:** {st.session_state.agent_details.get('language', 'N/A')}")
-                        st.write(f"**Category:** {st.session_state.agent_details.get('category', 'N/A')}")
+                        st.write(f"**Language:** {detail_language}")
+                        st.write(f"**Category:** {detail_category}")
             
             # Display primary prompt
             with st.expander("📖 View Primary Prompt", expanded=False):
-                st.markdown(st.session_state.primary_prompt)
+                show_prompt(primary, key="render_primary_phase1")
             
             # Download option
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = file_stamp(ss.primary_prompt_ts)
             st.download_button(
                 "📥 Download Primary Prompt",
-                st.session_state.primary_prompt,
+                get_blob(ss.primary_prompt_id, primary),
                 file_name=f"primary_prompt_{timestamp}.md",
                 mime="text/markdown"
             )
@@ -656,29 +1302,27 @@ def main():
             with col1:
                 agent_name = st.text_input(
                     "Agent Name *",
-                    value=st.session_state.agent_details.get('name', ''),
+                    value=agent_details.get('name', ''),
                     placeholder="e.g., Riya, Rahul, Sarah"
                 )
                 
                 company_name = st.text_input(
                     "Company Name *",
-                    value=st.session_state.agent_details.get('company', ''),
+                    value=agent_details.get('company', ''),
                     placeholder="e.g., Puravankara, HDFC Bank, Airtel"
                 )
             
             with col2:
                 agent_language = st.selectbox(
                     "Agent Language *",
-                    options=["Hinglish", "English", "Hindi", "Tamil", "Telugu", "Gujarati", "Marathi"],
-                    index=0 if not st.session_state.agent_details.get('language') else 
-                          ["Hinglish", "English", "Hindi", "Tamil", "Telugu", "Gujarati", "Marathi"].index(st.session_state.agent_details.get('language', 'Hinglish'))
+                    options=AGENT_LANGUAGES,
+                    index=AGENT_LANGUAGE_INDEX.get(agent_details.get('language'), 0)
                 )
                 
                 prompt_category = st.selectbox(
                     "Prompt Category *",
-                    options=["Lead Qualification", "EMI Reminder", "Property Sales", "Loan Collection", "Insurance Sales", "Customer Support", "Appointment Booking", "Survey & Feedback"],
-                    index=0 if not st.session_state.agent_details.get('category') else
-                          ["Lead Qualification", "EMI Reminder", "Property Sales", "Loan Collection", "Insurance Sales", "Customer Support", "Appointment Booking", "Survey & Feedback"].index(st.session_state.agent_details.get('category', 'Lead Qualification'))
+                    options=PROMPT_CATEGORIES,
+                    index=PROMPT_CATEGORY_INDEX.get(agent_details.get('category'), 0)
                 )
             
             # Save agent details
@@ -709,6 +1353,7 @@ def main():
                 )
                 
                 script_content = ""
+                uploaded_script = None
                 
                 if script_input_method == "Upload File":
                     uploaded_script = st.file_uploader(
@@ -717,15 +1362,6 @@ def main():
                         help="Upload your call script",
                         key="script_upload"
                     )
-                    
-                    if uploaded_script:
-                        try:
-                            script_content = uploaded_script.read().decode('utf-8')
-                            st.success(f"✅ Script uploaded: {uploaded_script.name}")
-                            with st.expander("Preview Script"):
-                                st.text_area("", script_content, height=200, disabled=True)
-                        except Exception as e:
-                            st.error(f"Error reading script: {str(e)}")
                 else:
                     script_content = st.text_area(
                         "Paste your script here:",
@@ -743,6 +1379,7 @@ def main():
                 )
                 
                 template_content = ""
+                uploaded_template = None
                 
                 if template_input_method == "Upload File":
                     uploaded_template = st.file_uploader(
@@ -751,15 +1388,6 @@ def main():
                         help="Upload your prompt template",
                         key="template_upload"
                     )
-                    
-                    if uploaded_template:
-                        try:
-                            template_content = uploaded_template.read().decode('utf-8')
-                            st.success(f"✅ Template uploaded: {uploaded_template.name}")
-                            with st.expander("Preview Template"):
-                                st.text_area("", template_content, height=200, disabled=True)
-                        except Exception as e:
-                            st.error(f"Error reading template: {str(e)}")
                 else:
                     template_content = st.text_area(
                         "Paste your template here:",
@@ -767,33 +1395,64 @@ def main():
                         placeholder="Enter your prompt template with placeholders [abc], [XYZ], etc."
                     )
             
+            # Decode the script and template uploads in parallel, then show each under its uploader
+            uploads = [(col1, "Script", uploaded_script), (col2, "Template", uploaded_template)]
+            uploads = [(col, label, f) for col, label, f in uploads if f]
+            decoded = decode_uploads([f for _, _, f in uploads])
+            for (col, label, uploaded_file), text in zip(uploads, decoded):
+                with col:
+                    if isinstance(text, Exception):
+                        st.error(f"Error reading {label.lower()}: {str(text)}")
+                        continue
+                    st.success(f"✅ {label} uploaded: {uploaded_file.name}")
+                    # Only the start of the file is sent, and only while the preview is open
+                    preview = st.expander(f"Preview {label}", key=f"preview_{label.lower()}", on_change="rerun")
+                    if preview.open:
+                        with preview:
+                            st.text_area(
+                                f"{label} preview",
+                                preview_text(text, TEXT_PREVIEW_CHARS),
+                                height=200,
+                                disabled=True,
+                                label_visibility="collapsed"
+                            )
+                if label == "Script":
+                    script_content = text
+                else:
+                    template_content = text
+            
             # Generate primary prompt
             st.markdown("---")
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
-                if st.button("🚀 Generate Primary Prompt", type="primary", use_container_width=True):
-                    if not st.session_state.agent_details:
-                        st.error("❌ Please save agent details first")
-                    elif not script_content.strip():
-                        st.error("❌ Please provide a script")
-                    elif not template_content.strip():
-                        st.error("❌ Please provide a template")
-                    elif not st.session_state.api_configured:
-                        st.error("❌ Please configure Gemini API key")
-                    else:
-                        primary_prompt = generate_primary_prompt(script_content, template_content, st.session_state.agent_details, model)
-                        if primary_prompt:
-                            st.session_state.primary_prompt = primary_prompt
-                            st.session_state.current_phase = 2
-                            st.success("✅ Primary prompt generated successfully!")
-                            st.balloons()
-                            st.rerun()
+                generate_clicked = st.button("🚀 Generate Primary Prompt", type="primary", use_container_width=True)
+            
+            # Stream the primary prompt at full width rather than inside the button column
+            if generate_clicked:
+                if not agent_details:
+                    st.error("❌ Please save agent details first")
+                elif not script_content.strip():
+                    st.error("❌ Please provide a script")
+                elif not template_content.strip():
+                    st.error("❌ Please provide a template")
+                elif model is None:
+                    st.error("❌ Please configure Gemini API key")
+                else:
+                    primary_prompt = generate_primary_prompt(script_content, template_content, agent_details, model)
+                    if primary_prompt:
+                        st.session_state.primary_prompt = primary_prompt
+                        st.session_state.primary_prompt_id = store_blob(primary_prompt)
+                        st.session_state.primary_prompt_key = completion_key(primary_prompt_request(script_content, template_content, agent_details), model)
+                        st.session_state.primary_prompt_ts = datetime.now()
+                        st.session_state.current_phase = 2
+                        st.success("✅ Primary prompt generated successfully!")
+                        st.rerun()
     
     # PHASE 2: CALL ANALYSIS
     with tab2:
         st.markdown('<div class="phase-header">🎵 Phase 2: Extract Insights from Call Recordings</div>', unsafe_allow_html=True)
         
-        if not st.session_state.primary_prompt:
+        if not primary:
             st.markdown("""
             <div class="warning-box">
                 <strong>⚠️ Phase 1 Required</strong><br>
@@ -809,11 +1468,11 @@ def main():
             """, unsafe_allow_html=True)
             
             # Show current insights count
-            if len(st.session_state.call_insights) > 0:
+            if len(call_insights) > 0:
                 st.markdown(f"""
                 <div class="success-box">
                     <strong>📊 Progress Update</strong><br>
-                    You have analyzed <strong>{len(st.session_state.call_insights)} call(s)</strong> so far. 
+                    You have analyzed <strong>{len(call_insights)} call(s)</strong> so far. 
                     Continue adding more calls for better insights, or proceed to Phase 3 to generate your master prompt.
                 </div>
                 """, unsafe_allow_html=True)
@@ -837,7 +1496,9 @@ def main():
                 for i, audio_file in enumerate(uploaded_audios):
                     with cols[i % 3]:
                         st.write(f"📁 {audio_file.name}")
-                        st.audio(audio_file)
+                        # Only send the recording back to the browser when asked to
+                        if st.checkbox("▶️ Preview", key=f"preview_audio_{i}"):
+                            st.audio(audio_file, format=audio_file.type)
                 
                 # Batch processing options
                 col1, col2 = st.columns(2)
@@ -867,7 +1528,7 @@ def main():
                 if st.button(button_text, type="primary", use_container_width=True, key=button_key):
                     if not deepgram_key:
                         st.error("❌ Please provide Deepgram API key in sidebar")
-                    elif not st.session_state.api_configured:
+                    elif model is None:
                         st.error("❌ Please configure Gemini API key")
                     else:
                         # Determine which files to process
@@ -881,61 +1542,81 @@ def main():
                         failed_analyses = 0
                         
                         # Create progress bar for multiple files
-                        if len(files_to_process) > 1:
+                        show_progress = len(files_to_process) > 1
+                        if show_progress:
                             progress_bar = st.progress(0)
                             status_text = st.empty()
+                            status_text.text(f"Transcribing {len(files_to_process)} recordings...")
                         
-                        for i, audio_file in enumerate(files_to_process):
-                            if len(files_to_process) > 1:
-                                progress = (i) / len(files_to_process)
-                                progress_bar.progress(progress)
-                                status_text.text(f"Processing {audio_file.name} ({i+1}/{len(files_to_process)})")
+                        def on_transcribed(n):
+                            progress_bar.progress(n / len(files_to_process) / 2)
+                            status_text.text(f"Transcribed {n}/{len(files_to_process)} recordings...")
+                        
+                        # Step 1: Transcribe every file concurrently
+                        if len(files_to_process) == 1:
+                            st.info(f"Step 1: Transcribing {files_to_process[0].name}...")
+                        with st.spinner(f"Transcribing {len(files_to_process)} recording(s)..."):
+                            transcription_results = run_transcriptions(
+                                files_to_process, deepgram_key, language, on_transcribed if show_progress else None
+                            )
+                        
+                        transcribed = []
+                        for audio_file, transcription_result in zip(files_to_process, transcription_results):
+                            if isinstance(transcription_result, Exception):
+                                failed_analyses += 1
+                                st.error(f"❌ Transcription failed for {audio_file.name}: {transcription_result}")
+                                continue
                             
-                            with st.spinner(f"Processing {audio_file.name}..."):
-                                # Step 1: Transcribe
-                                if len(files_to_process) == 1:
-                                    st.info(f"Step 1: Transcribing {audio_file.name}...")
-                                
-                                transcription_result = transcribe_audio(audio_file.getvalue(), deepgram_key, language)
-                                
-                                if transcription_result:
-                                    formatted_transcript = format_transcript(transcription_result)
-                                    st.session_state.transcriptions.append({
-                                        'filename': audio_file.name,
-                                        'transcript': formatted_transcript,
-                                        'timestamp': datetime.now()
-                                    })
-                                    
-                                    if len(files_to_process) == 1:
-                                        st.success(f"✅ Transcription completed for {audio_file.name}")
-                                        st.info(f"Step 2: Extracting insights from {audio_file.name}...")
-                                    
-                                    # Step 2: Extract insights
-                                    insights = extract_call_insights(formatted_transcript, st.session_state.primary_prompt, model)
-                                    
-                                    if insights:
-                                        st.session_state.call_insights.append({
-                                            'filename': audio_file.name,
-                                            'insights': insights,
-                                            'transcript': formatted_transcript,
-                                            'timestamp': datetime.now()
-                                        })
-                                        
-                                        successful_analyses += 1
-                                        
-                                        if len(files_to_process) == 1:
-                                            st.success(f"✅ Insights extracted from {audio_file.name}")
-                                            # Show quick preview for single file
-                                            with st.expander(f"📋 Preview Insights - {audio_file.name}"):
-                                                st.markdown(insights)
-                                    else:
-                                        failed_analyses += 1
-                                        if len(files_to_process) == 1:
-                                            st.error(f"❌ Failed to extract insights from {audio_file.name}")
-                                else:
-                                    failed_analyses += 1
-                                    if len(files_to_process) == 1:
-                                        st.error(f"❌ Transcription failed for {audio_file.name}")
+                            transcribed.append((audio_file, format_transcript(transcription_result)))
+                        
+                        # Step 2: Extract insights from every transcript concurrently
+                        insight_results = []
+                        if transcribed:
+                            if len(files_to_process) == 1:
+                                st.success(f"✅ Transcription completed for {transcribed[0][0].name}")
+                                st.info(f"Step 2: Extracting insights from {transcribed[0][0].name}...")
+                            
+                            if show_progress:
+                                progress_bar.progress(0.5)
+                                status_text.text(f"Extracting insights from {len(transcribed)} calls...")
+                            
+                            def on_extracted(n):
+                                progress_bar.progress(0.5 + n / len(transcribed) / 2)
+                                status_text.text(f"Extracted insights from {n}/{len(transcribed)} calls...")
+                            
+                            with st.spinner(f"🔍 Extracting insights from {len(transcribed)} call(s)..."):
+                                # Upload the primary prompt once when several calls will reference it
+                                prompt_cache = None
+                                if len(transcribed) > 1:
+                                    prompt_cache = get_primary_prompt_cache(gemini_key, primary)
+                                insight_results = extract_all(
+                                    [transcript for _, transcript in transcribed],
+                                    primary,
+                                    model,
+                                    prompt_cache,
+                                    on_extracted if show_progress else None
+                                )
+                        
+                        for (audio_file, formatted_transcript), insights in zip(transcribed, insight_results):
+                            if isinstance(insights, Exception) or not insights:
+                                failed_analyses += 1
+                                st.error(f"❌ Failed to extract insights from {audio_file.name}")
+                                continue
+                            
+                            call_insights.append({
+                                'filename': audio_file.name,
+                                'insights': insights,
+                                'transcript': formatted_transcript,
+                                'timestamp': datetime.now()
+                            })
+                            
+                            successful_analyses += 1
+                            
+                            if len(files_to_process) == 1:
+                                st.success(f"✅ Insights extracted from {audio_file.name}")
+                                # Show quick preview for single file
+                                with st.expander(f"📋 Preview Insights - {audio_file.name}"):
+                                    st.markdown(insights)
                         
                         # Final progress update for multiple files
                         if len(files_to_process) > 1:
@@ -944,7 +1625,7 @@ def main():
                         
                         # Show final results
                         if successful_analyses > 0:
-                            st.success(f"✅ Successfully analyzed {successful_analyses} call(s)! Total calls analyzed: {len(st.session_state.call_insights)}")
+                            st.success(f"✅ Successfully analyzed {successful_analyses} call(s)! Total calls analyzed: {len(call_insights)}")
                             st.balloons()
                             
                             # Show summary for multiple files
@@ -957,7 +1638,7 @@ def main():
                                     
                                     # List processed files
                                     st.markdown("**Successfully Processed Files:**")
-                                    recent_insights = st.session_state.call_insights[-successful_analyses:]
+                                    recent_insights = call_insights[-successful_analyses:]
                                     for insight in recent_insights:
                                         st.write(f"• {insight['filename']}")
                         
@@ -965,23 +1646,23 @@ def main():
                             st.error(f"❌ Failed to analyze {failed_analyses} call(s)")
                 
                 # Quick stats
-                if len(st.session_state.call_insights) > 0:
+                if len(call_insights) > 0:
                     st.markdown("---")
                     st.markdown("### 📊 Current Progress")
                     col1, col2, col3 = st.columns(3)
                     with col1:
                         st.metric("Files Selected", len(uploaded_audios))
                     with col2:
-                        st.metric("Calls Analyzed", len(st.session_state.call_insights))
+                        st.metric("Calls Analyzed", len(call_insights))
                     with col3:
-                        st.metric("Ready for Phase 3", "✅" if len(st.session_state.call_insights) > 0 else "❌")
+                        st.metric("Ready for Phase 3", "✅" if len(call_insights) > 0 else "❌")
             
             # Quick actions
-            if len(st.session_state.call_insights) > 0:
+            if len(call_insights) > 0:
                 st.markdown("---")
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.markdown(f"**{len(st.session_state.call_insights)} calls analyzed**")
+                    st.markdown(f"**{len(call_insights)} calls analyzed**")
                     st.write("Ready to generate master prompt!")
                 with col2:
                     if st.button("➡️ Proceed to Phase 3", type="secondary", use_container_width=True):
@@ -992,14 +1673,35 @@ def main():
     with tab3:
         st.header("📋 Extracted Call Insights")
         
-        if len(st.session_state.call_insights) == 0:
+        if len(call_insights) == 0:
             st.info("No call insights available yet. Upload and analyze call recordings in Phase 2.")
         else:
-            st.markdown(f"**Total Calls Analyzed:** {len(st.session_state.call_insights)}")
+            st.markdown(f"**Total Calls Analyzed:** {len(call_insights)}")
+            
+            # Show one page of calls at a time
+            first = 0
+            if len(call_insights) > CALLS_PER_PAGE:
+                page = st.number_input(
+                    "Page",
+                    min_value=1,
+                    max_value=(len(call_insights) - 1) // CALLS_PER_PAGE + 1,
+                    step=1,
+                    key="insights_page"
+                )
+                first = (page - 1) * CALLS_PER_PAGE
             
-            # Display each insight
-            for i, call_data in enumerate(st.session_state.call_insights, 1):
-                with st.expander(f"📞 Call {i}: {call_data['filename']}", expanded=False):
+            # Display each insight; an expander's contents only run while it is open
+            for i, call_data in enumerate(call_insights[first:first + CALLS_PER_PAGE], first + 1):
+                call_expander = st.expander(
+                    f"📞 Call {i}: {call_data['filename']}",
+                    expanded=False,
+                    key=f"call_expander_{i}",
+                    on_change="rerun"
+                )
+                if not call_expander.open:
+                    continue
+                
+                with call_expander:
                     
                     # Tabs for transcript and insights
                     sub_tab1, sub_tab2 = st.tabs(["🔍 Insights", "📝 Transcript"])
@@ -1008,7 +1710,14 @@ def main():
                         st.markdown(call_data['insights'])
                     
                     with sub_tab2:
-                        st.code(call_data['transcript'], language=None)
+                        st.text_area(
+                            f"Transcript {i}",
+                            call_data['transcript'],
+                            height=300,
+                            disabled=True,
+                            label_visibility="collapsed",
+                            key=f"transcript_text_{i}"
+                        )
                     
                     # Download options
                     col1, col2 = st.columns(2)
@@ -1030,33 +1739,41 @@ def main():
                         )
             
             # Consolidated insights download
-            if len(st.session_state.call_insights) > 1:
+            if len(call_insights) > 1:
                 st.markdown("---")
-                all_insights = "\n\n" + "="*50 + "\n\n".join([
-                    f"# CALL {i+1}: {call['filename']}\n\n{call['insights']}" 
-                    for i, call in enumerate(st.session_state.call_insights)
-                ])
-                
-                st.download_button(
-                    "📦 Download All Insights Combined",
-                    all_insights,
-                    file_name=f"all_call_insights_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                    mime="text/markdown",
-                    use_container_width=True
-                )
+                stamp = file_stamp(call_insights[-1]['timestamp'])
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.download_button(
+                        "📦 Download All Insights Combined",
+                        combined_insights(call_insights),
+                        file_name=f"all_call_insights_{stamp}.md",
+                        mime="text/markdown",
+                        use_container_width=True
+                    )
+                with col2:
+                    # The archive is only built once the button is clicked
+                    calls = list(call_insights)
+                    st.download_button(
+                        "🗜️ Download Insights as ZIP",
+                        lambda: insights_zip(calls),
+                        file_name=f"call_insights_{stamp}.zip",
+                        mime="application/zip",
+                        use_container_width=True
+                    )
 
     # PHASE 3: MASTER PROMPT CREATION
     with tab4:
         st.markdown('<div class="phase-header">🧠 Phase 3: Generate Master Prompt</div>', unsafe_allow_html=True)
         
-        if not st.session_state.primary_prompt:
+        if not primary:
             st.markdown("""
             <div class="warning-box">
                 <strong>⚠️ Phase 1 Required</strong><br>
                 Please complete Phase 1 (Create Primary Prompt) first.
             </div>
             """, unsafe_allow_html=True)
-        elif len(st.session_state.call_insights) == 0:
+        elif len(call_insights) == 0:
             st.markdown("""
             <div class="warning-box">
                 <strong>⚠️ Phase 2 Required</strong><br>
@@ -1064,7 +1781,7 @@ def main():
             </div>
             """, unsafe_allow_html=True)
         else:
-            if st.session_state.master_prompt:
+            if master:
                 st.markdown("""
                 <div class="success-box">
                     <strong>🎉 Phase 3 Completed!</strong><br>
@@ -1075,22 +1792,28 @@ def main():
                 
                 # Display master prompt
                 with st.expander("🧠 View Master Prompt", expanded=True):
-                    st.markdown(st.session_state.master_prompt)
+                    show_prompt(master, key="render_master_phase3")
                 
                 # Download and actions
                 col1, col2 = st.columns(2)
                 with col1:
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    timestamp = file_stamp(ss.master_prompt_ts)
                     st.download_button(
                         "📥 Download Master Prompt",
-                        st.session_state.master_prompt,
+                        get_blob(ss.master_prompt_id, master),
                         file_name=f"master_prompt_{timestamp}.md",
                         mime="text/markdown",
                         use_container_width=True
                     )
                 with col2:
                     if st.button("🔄 Regenerate Master Prompt", use_container_width=True):
+                        # Forget this master prompt's completion so regeneration asks Gemini again
+                        if model is not None:
+                            all_insights = [call['insights'] for call in call_insights]
+                            forget_completion(completion_key(master_prompt_instructions(primary, all_insights, agent_details), model))
                         st.session_state.master_prompt = None
+                        st.session_state.master_prompt_id = None
+                        st.session_state.master_prompt_ts = None
                         st.rerun()
                 
             else:
@@ -1108,56 +1831,60 @@ def main():
                 with col1:
                     st.metric("Primary Prompt", "✅ Ready")
                 with col2:
-                    st.metric("Calls Analyzed", len(st.session_state.call_insights))
+                    st.metric("Calls Analyzed", len(call_insights))
                 with col3:
                     st.metric("Agent Details", "✅ Configured")
                 
                 # Preview what will be included
                 with st.expander("📋 Preview: What Will Be Included", expanded=False):
                     st.markdown("**👤 Agent Details:**")
-                    for key, value in st.session_state.agent_details.items():
+                    for key, value in agent_details.items():
                         st.write(f"• **{key.title()}:** {value}")
                     
                     st.markdown("**📝 Primary Prompt:**")
-                    st.text_area("", st.session_state.primary_prompt[:500] + "...", height=100, disabled=True)
+                    st.text_area("", primary[:500] + "...", height=100, disabled=True)
                     
-                    st.markdown(f"**🔍 Insights from {len(st.session_state.call_insights)} Call(s):**")
-                    for i, call in enumerate(st.session_state.call_insights, 1):
+                    st.markdown(f"**🔍 Insights from {len(call_insights)} Call(s):**")
+                    for i, call in enumerate(call_insights, 1):
                         st.write(f"• Call {i}: {call['filename']}")
                 
                 # Generate master prompt button
                 st.markdown("---")
                 col1, col2, col3 = st.columns([1, 2, 1])
                 with col2:
-                    if st.button("🧠 Generate Master Prompt", type="primary", use_container_width=True):
-                        if not st.session_state.api_configured:
-                            st.error("❌ Please configure Gemini API key")
+                    generate_clicked = st.button("🧠 Generate Master Prompt", type="primary", use_container_width=True)
+                
+                # Stream the master prompt at full width rather than inside the button column
+                if generate_clicked:
+                    if model is None:
+                        st.error("❌ Please configure Gemini API key")
+                    else:
+                        # Extract all insights
+                        all_insights = [call['insights'] for call in call_insights]
+                        
+                        # Generate master prompt
+                        master_prompt = generate_master_prompt(
+                            primary,
+                            all_insights,
+                            agent_details,
+                            model
+                        )
+                        
+                        if master_prompt:
+                            st.session_state.master_prompt = master_prompt
+                            st.session_state.master_prompt_id = store_blob(master_prompt)
+                            st.session_state.master_prompt_ts = datetime.now()
+                            st.session_state.current_phase = 4
+                            st.success("🎉 Master prompt generated successfully!")
+                            st.rerun()
                         else:
-                            # Extract all insights
-                            all_insights = [call['insights'] for call in st.session_state.call_insights]
-                            
-                            # Generate master prompt
-                            master_prompt = generate_master_prompt(
-                                st.session_state.primary_prompt,
-                                all_insights,
-                                st.session_state.agent_details,
-                                model
-                            )
-                            
-                            if master_prompt:
-                                st.session_state.master_prompt = master_prompt
-                                st.session_state.current_phase = 4
-                                st.success("🎉 Master prompt generated successfully!")
-                                st.balloons()
-                                st.rerun()
-                            else:
-                                st.error("❌ Failed to generate master prompt")
+                            st.error("❌ Failed to generate master prompt")
 
     # PHASE 4: REFINE & TEST
     with tab5:
         st.markdown('<div class="phase-header">🔧 Phase 4: Test & Refine Master Prompt</div>', unsafe_allow_html=True)
         
-        if not st.session_state.master_prompt:
+        if not master:
             st.markdown("""
             <div class="warning-box">
                 <strong>⚠️ Phase 3 Required</strong><br>
@@ -1175,18 +1902,18 @@ def main():
             
             # Current Master Prompt Section
             with st.expander("🧠 Current Master Prompt", expanded=False):
-                st.markdown(st.session_state.master_prompt)
+                show_prompt(master, key="render_master_phase4")
             
             # Refinement History
-            if st.session_state.refinement_history:
-                st.markdown(f"### 📈 Refinement History ({len(st.session_state.refinement_history)} changes made)")
+            if refinement_history:
+                st.markdown(f"### 📈 Refinement History ({len(refinement_history)} changes made)")
                 
-                for i, refinement in enumerate(reversed(st.session_state.refinement_history), 1):
-                    with st.expander(f"🔄 Refinement {len(st.session_state.refinement_history) - i + 1}: {refinement['timestamp'].strftime('%Y-%m-%d %H:%M')}", expanded=False):
+                for i, refinement in enumerate(reversed(refinement_history), 1):
+                    with st.expander(f"🔄 Refinement {len(refinement_history) - i + 1}: {refinement.label}", expanded=False):
                         st.markdown("**Issue Reported:**")
-                        st.write(refinement['feedback'])
+                        st.write(refinement.feedback)
                         st.markdown("**Changes Made:**")
-                        st.code(refinement['summary'], language=None)
+                        st.code(refinement.summary, language=None)
             
             # Refinement Interface
             st.markdown('<div class="refinement-section">', unsafe_allow_html=True)
@@ -1210,50 +1937,52 @@ def main():
             
             col1, col2 = st.columns([1, 4])
             with col1:
-                if st.button("🔧 Refine Prompt", type="primary", disabled=not user_feedback.strip()):
-                    if not st.session_state.api_configured:
-                        st.error("❌ Please configure Gemini API key")
-                    elif not user_feedback.strip():
-                        st.error("❌ Please describe the issue")
-                    else:
-                        # Refine the prompt
-                        refined_prompt = refine_master_prompt(
-                            st.session_state.master_prompt,
-                            user_feedback,
-                            model
-                        )
-                        
-                        if refined_prompt:
-                            # Save to history
-                            st.session_state.refinement_history.append({
-                                'feedback': user_feedback,
-                                'old_prompt': st.session_state.master_prompt,
-                                'new_prompt': refined_prompt,
-                                'summary': f"Updated prompt based on: {user_feedback[:100]}{'...' if len(user_feedback) > 100 else ''}",
-                                'timestamp': datetime.now()
-                            })
-                            
-                            # Update current prompt
-                            st.session_state.master_prompt = refined_prompt
-                            
-                            st.success("✅ Prompt refined successfully!")
-                            st.balloons()
-                            st.rerun()
-                        else:
-                            st.error("❌ Failed to refine prompt")
-            
+                refine_clicked = st.button("🔧 Refine Prompt", type="primary", disabled=not user_feedback.strip())
             with col2:
                 if st.button("📥 Download Current Version", use_container_width=True):
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    version = len(st.session_state.refinement_history) + 1
+                    timestamp = file_stamp(ss.master_prompt_ts)
                     st.download_button(
-                        f"📥 Download Master Prompt v{version}",
-                        st.session_state.master_prompt,
-                        file_name=f"master_prompt_v{version}_{timestamp}.md",
+                        f"📥 Download Master Prompt v{final_version}",
+                        get_blob(ss.master_prompt_id, master),
+                        file_name=f"master_prompt_v{final_version}_{timestamp}.md",
                         mime="text/markdown",
                         key="download_current_version"
                     )
             
+            # Stream the refinement at full width rather than inside the button column
+            if refine_clicked:
+                if model is None:
+                    st.error("❌ Please configure Gemini API key")
+                elif not user_feedback.strip():
+                    st.error("❌ Please describe the issue")
+                else:
+                    # Refine the prompt
+                    refined_prompt = refine_master_prompt(
+                        master,
+                        user_feedback,
+                        model
+                    )
+                    
+                    if refined_prompt:
+                        # Save to history
+                        refinement_history.append(Refinement(
+                            timestamp=datetime.now(),
+                            feedback=user_feedback,
+                            summary=f"Updated prompt based on: {user_feedback[:100]}{'...' if len(user_feedback) > 100 else ''}",
+                            old_prompt=master,
+                            new_prompt=refined_prompt,
+                        ))
+                        
+                        # Update current prompt
+                        st.session_state.master_prompt = refined_prompt
+                        st.session_state.master_prompt_id = store_blob(refined_prompt)
+                        st.session_state.master_prompt_ts = datetime.now()
+                        
+                        st.success("✅ Prompt refined successfully!")
+                        st.rerun()
+                    else:
+                        st.error("❌ Failed to refine prompt")
+            
             st.markdown('</div>', unsafe_allow_html=True)
             
             # Quick refinement suggestions
@@ -1279,7 +2008,7 @@ def main():
     with tab6:
         st.header("📊 Final Results & Evolution Tracking")
         
-        if not st.session_state.master_prompt:
+        if not master:
             st.info("Complete all phases to see the final results and evolution tracking.")
         else:
             st.markdown("""
@@ -1296,304 +2025,30 @@ def main():
             with col1:
                 st.metric("Phases Completed", "4/4")
             with col2:
-                st.metric("Calls Analyzed", len(st.session_state.call_insights))
+                st.metric("Calls Analyzed", len(call_insights))
             with col3:
-                st.metric("Insights Extracted", len(st.session_state.call_insights))
+                st.metric("Insights Extracted", len(call_insights))
             with col4:
-                st.metric("Refinements Made", len(st.session_state.refinement_history))
+                st.metric("Refinements Made", len(refinement_history))
             with col5:
-                st.metric("Final Version", f"v{len(st.session_state.refinement_history) + 1}")
+                st.metric("Final Version", f"v{final_version}")
             
             # Evolution Timeline
             st.markdown("### 🕒 Evolution Timeline")
             
-            timeline_data = []
-            timeline_data.append({"Phase": "Phase 1", "Action": "Primary Prompt Created", "Details": f"Agent: {st.session_state.agent_details.get('name', 'N/A')}, Category: {st.session_state.agent_details.get('category', 'N/A')}"})
-            timeline_data.append({"Phase": "Phase 2", "Action": f"{len(st.session_state.call_insights)} Calls Analyzed", "Details": "Real call insights extracted"})
-            timeline_data.append({"Phase": "Phase 3", "Action": "Master Prompt Generated", "Details": "Combined insights with primary prompt"})
-            
-            for i, refinement in enumerate(st.session_state.refinement_history, 1):
-                timeline_data.append({"Phase": f"Phase 4.{i}", "Action": f"Refinement {i}", "Details": refinement['feedback'][:50] + "..."})
-            
-            df = pd.DataFrame(timeline_data)
+            df = evolution_timeline(
+                detail_name,
+                detail_category,
+                len(call_insights),
+                tuple(refinement.feedback for refinement in refinement_history)
+            )
             st.dataframe(df, use_container_width=True, hide_index=True)
             
-            # Comparison tabs
-            st.markdown("### 🔍 Evolution Comparison")
-            
-            compare_tab1, compare_tab2, compare_tab3, compare_tab4 = st.tabs([
-                "📝 Primary Prompt (v1)", 
-                "🧠 Master Prompt (Final)", 
-                "📊 Evolution Analysis",
-                "🔄 Refinement History"
-            ])
-            
-            with compare_tab1:
-                st.markdown("#### Original Primary Prompt (Version 1)")
-                st.markdown(st.session_state.primary_prompt)
-                
-                st.download_button(
-                    "📥 Download Primary Prompt",
-                    st.session_state.primary_prompt,
-                    file_name=f"primary_prompt_v1_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                    mime="text/markdown"
-                )
-            
-            with compare_tab2:
-                st.markdown(f"#### Final Master Prompt (Version {len(st.session_state.refinement_history) + 1})")
-                st.markdown(st.session_state.master_prompt)
-                
-                st.download_button(
-                    "📥 Download Final Master Prompt",
-                    st.session_state.master_prompt,
-                    file_name=f"master_prompt_final_v{len(st.session_state.refinement_history) + 1}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                    mime="text/markdown"
-                )
-            
-            with compare_tab3:
-                st.markdown("#### Evolution Analysis")
-                
-                # Generate evolution analysis
-                if st.button("📊 Generate Evolution Analysis", type="secondary"):
-                    if st.session_state.api_configured:
-                        evolution_prompt = f"""
-Compare these AI agent prompts and provide a detailed analysis of how the prompt evolved from theory to practice:
-
-**AGENT DETAILS:**
-- Name: {st.session_state.agent_details.get('name', 'N/A')}
-- Company: {st.session_state.agent_details.get('company', 'N/A')}
-- Language: {st.session_state.agent_details.get('language', 'N/A')}
-- Category: {st.session_state.agent_details.get('category', 'N/A')}
-
-**ORIGINAL PRIMARY PROMPT:**
-{st.session_state.primary_prompt}
-
-**EVOLVED MASTER PROMPT:**
-{st.session_state.master_prompt}
-
-**EVOLUTION PROCESS:**
-- Insights used: {len(st.session_state.call_insights)} real call recordings analyzed
-- Refinements made: {len(st.session_state.refinement_history)} iterative improvements
-
-Please provide analysis in this format:
-
-## 📊 PROMPT EVOLUTION ANALYSIS
-
-### ✅ Key Improvements Made:
-[List specific improvements from primary to master]
-
-### 🎯 New Elements Added:
-[List new elements that weren't in the primary prompt]
-
-### 💬 Enhanced Dialogue Examples:
-[Compare dialogue examples between versions]
-
-### 🔄 Improved Objection Handling:
-[How objection handling was enhanced]
-
-### 📈 Practical Enhancements:
-[Real-world improvements based on call insights]
-
-### 🎭 Behavioral Improvements:
-[How the AI agent behavior was refined]
-
-### 🔧 Refinement Impact:
-[How iterative refinements improved the prompt]
-
-### 📊 Evolution Metrics:
-- Comprehensiveness: Estimate % increase
-- Practical Examples: Count new examples added
-- Objection Coverage: Count new objections covered
-- Dialogue Quality: Improvements made
-- Structure Completeness: All required sections present
-
-### 💡 Key Learnings:
-[What this evolution teaches us about AI prompt development]
-"""
-                        
-                        with st.spinner("Analyzing prompt evolution..."):
-                            response = model.generate_content(evolution_prompt)
-                            if response:
-                                st.markdown(response.text)
-                                
-                                # Download evolution analysis
-                                st.download_button(
-                                    "📥 Download Evolution Analysis",
-                                    response.text,
-                                    file_name=f"evolution_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                                    mime="text/markdown"
-                                )
-                    else:
-                        st.error("❌ Please configure Gemini API key")
-            
-            with compare_tab4:
-                st.markdown("#### Refinement History")
-                
-                if not st.session_state.refinement_history:
-                    st.info("No refinements made yet. All improvements came from call insights analysis.")
-                else:
-                    for i, refinement in enumerate(st.session_state.refinement_history, 1):
-                        with st.expander(f"🔧 Refinement {i}: {refinement['timestamp'].strftime('%Y-%m-%d %H:%M')}", expanded=False):
-                            
-                            col1, col2 = st.columns([1, 1])
-                            with col1:
-                                st.markdown("**Issue Reported:**")
-                                st.write(refinement['feedback'])
-                            
-                            with col2:
-                                st.markdown("**Changes Summary:**")
-                                st.code(refinement['summary'], language=None)
-                            
-                            # Show before/after comparison for this refinement
-                            ref_tab1, ref_tab2 = st.tabs([f"Before v{i}", f"After v{i+1}"])
-                            
-                            with ref_tab1:
-                                st.text_area("", refinement['old_prompt'], height=200, disabled=True, key=f"before_{i}")
-                            
-                            with ref_tab2:
-                                st.text_area("", refinement['new_prompt'], height=200, disabled=True, key=f"after_{i}")
-            
-            # Final download package
-            st.markdown("---")
-            st.markdown("### 📦 Complete Package Download")
-            
-            # Create complete package
-            refinement_section = ""
-            if st.session_state.refinement_history:
-                refinement_section = f"""
-
-## 🔧 Refinement History
-
-{chr(10).join([f"### Refinement {i}: {refinement['timestamp'].strftime('%Y-%m-%d %H:%M')}{chr(10)}**Issue:** {refinement['feedback']}{chr(10)}**Summary:** {refinement['summary']}{chr(10)}" for i, refinement in enumerate(st.session_state.refinement_history, 1)])}
-"""
-            
-            complete_package = f"""# AI Prompt Evolution Complete Package
-
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-## 📊 Evolution Summary
-
-- **Phases Completed:** 4/4
-- **Agent Name:** {st.session_state.agent_details.get('name', 'N/A')}
-- **Company:** {st.session_state.agent_details.get('company', 'N/A')}
-- **Language:** {st.session_state.agent_details.get('language', 'N/A')}
-- **Category:** {st.session_state.agent_details.get('category', 'N/A')}
-- **Calls Analyzed:** {len(st.session_state.call_insights)}
-- **Refinements Made:** {len(st.session_state.refinement_history)}
-- **Final Version:** v{len(st.session_state.refinement_history) + 1}
-
-## 📝 Original Primary Prompt (v1)
-
-{st.session_state.primary_prompt}
-
----
-
-## 🔍 Call Insights Used
-
-{chr(10).join([f"### Call {i+1}: {call['filename']}{chr(10)}{call['insights']}{chr(10)}" for i, call in enumerate(st.session_state.call_insights)])}
-
----
-{refinement_section}
----
-
-## 🧠 Final Master Prompt (v{len(st.session_state.refinement_history) + 1})
-
-{st.session_state.master_prompt}
-
----
-
-*Generated by AI Prompt Evolution Suite - Complete 4-Phase Evolution Process*
-"""
-            
-            st.download_button(
-                "📦 Download Complete Evolution Package",
-                complete_package,
-                file_name=f"ai_prompt_evolution_package_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                mime="text/markdown",
-                use_container_width=True,
-                type="primary",
-                key="download_complete_package"
-            )
+            evolution_comparison(primary, master, agent_details, call_insights, refinement_history, model)
     
     # Help section
-    with st.expander("ℹ️ How to Use This Enhanced Suite"):
-        st.markdown("""
-        ### 🔄 Complete 4-Phase Workflow Guide:
-
-        #### 📝 Phase 1: Create Primary Prompt
-        1. **Configure API**: Enter your Gemini API key in the sidebar
-        2. **Agent Details**: Fill in agent name, company, language, and category
-        3. **Upload Script**: Provide your call script with detailed flow and information
-        4. **Upload Template**: Provide a prompt template with placeholders [abc], [XYZ], etc.
-        5. **Generate**: Click "Generate Primary Prompt" to create your baseline prompt
-
-        #### 🎵 Phase 2: Extract Insights from Real Calls
-        1. **Configure Deepgram**: Enter your Deepgram API key for transcription
-        2. **Upload Recordings**: Upload actual call recordings (MP3, WAV, M4A, FLAC)
-        3. **Analyze**: Each call will be transcribed and analyzed for insights
-        4. **Collect**: Analyze multiple calls to gather comprehensive insights
-
-        #### 🧠 Phase 3: Generate Master Prompt
-        1. **Review**: Check your primary prompt and collected insights
-        2. **Generate**: Create the final master prompt that combines theory + practice
-        3. **Structure**: Ensures all required sections are included in proper markdown format
-        4. **Optimize**: Incorporates real-world learnings into structured prompt
-
-        #### 🔧 Phase 4: Test & Refine (NEW!)
-        1. **Test**: Use your master prompt in real scenarios
-        2. **Report Issues**: Describe any problems or areas for improvement
-        3. **Refine**: Get instant updates to fix specific issues
-        4. **Iterate**: Continue refining based on performance feedback
-        5. **Track**: All changes are versioned and tracked
-
-        ### 💡 Best Practices:
-
-        #### Phase 1: 
-        - Choose accurate agent details (name, language, category)
-        - Include comprehensive scripts with objection handling
-        - Use templates with clear placeholders
-
-        #### Phase 2: 
-        - Analyze both successful and challenging calls
-        - Use high-quality audio files for better transcription
-        - Include diverse call scenarios
-
-        #### Phase 3: 
-        - Review the generated structure carefully
-        - Ensure all required sections are present
-        - Verify agent details are properly incorporated
-
-        #### Phase 4: 
-        - Test thoroughly before reporting issues
-        - Be specific about what's not working
-        - Use iterative refinement for best results
-
-        ### 🎯 Expected Outcomes:
-
-        - **Primary Prompt**: Theoretical baseline with agent details and structure
-        - **Call Insights**: Real-world patterns and improvements needed  
-        - **Master Prompt**: Production-ready prompt with all required sections
-        - **Refined Prompt**: Continuously improved based on real performance
-
-        ### 📋 Required Master Prompt Sections:
-        
-        The final master prompt includes all these sections:
-        - **Primary Objective**
-        - **Objective** (numbered list)
-        - **Strict Rules**
-        - **User Details**
-        - **AI Agent Identity**
-        - **Name Usage Guideline**
-        - **Call scheduling rules**
-        - **Call Script** (main flow)
-        - **Strict Interaction Rules (English)**
-        - **Handling Short Responses & Maintaining Conversation Flow**
-        - **Standard Objection Handling**
-        - **Fundamental Guidelines for Responses**
-        - **Numeric & Language Best Practices**
-        - **Guidelines for Conversation** (in selected language)
-        - **Strict Guidelines**
-        """)
+    if st.toggle("ℹ️ How to Use This Enhanced Suite", key="show_help"):
+        st.markdown(get_help())
     
     # Footer
     st.markdown("---")